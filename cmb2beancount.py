@@ -9,19 +9,146 @@
 """
 
 import argparse
-from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from datetime import MAXYEAR, MINYEAR, datetime
+from functools import partial
 import logging
+import operator
 import os
 import re
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import pdfplumber
 import yaml
 
+try:
+    import pymupdf
+except ImportError:  # PyMuPDF为可选依赖，未安装时使用pdfplumber
+    pymupdf = None
+
+# 空白字符
+_WS_RE = re.compile(r'\s+')
+# 还款交易格式（只有记账日）：记账日 商户名称 金额 卡号末四位 交易地金额
+_REPAY_RE = re.compile(r'(\d{2}/\d{2})\s+([^0-9]+?还款[^0-9]*?)\s+([-+]?[\d,.]+)\s+(\d{4})\s+(.*?)(?:\s*$|\s*\(.*\)$)')
+# 普通交易格式：交易日 记账日 商户名称 金额 卡号末四位 交易地金额
+_NORMAL_RE = re.compile(r'(\d{2}/\d{2})\s+(\d{2}/\d{2})\s+([^0-9]+?)\s+([-+]?[\d,.]+)\s+(\d{4})\s+(.*?)(?:\s*$|\s*\(.*\)$)')
+# 信用卡账单日期格式（MM/DD）
+_MMDD_RE = re.compile(r'\d{2}/\d{2}$')
+# 金额中的货币符号、空白字符和千位分隔符
+_AMOUNT_CLEAN_RE = re.compile(r'[¥\s,]')
+# 至少包含一个数字
+_HAS_DIGIT_RE = re.compile(r'\d')
+
+# 非交易行关键词，合并为一个正则以便单次扫描
+_SKIP_KEYWORDS = ('账单', '信用卡', '人民币', '美元', '合计', '小计', '币种', '卡号', '交易日', '本期', '上期', '备注')
+_SKIP_RE = re.compile('|'.join(map(re.escape, _SKIP_KEYWORDS)))
+
+# 可能需要报销的交易关键词
+_REIMBURSABLE_KEYWORDS = (
+    '中铁网络', '铁路客票', '火车票', '动车', '高铁', '12306',
+    '差旅', '商务', '出差', '机票', '酒店', '住宿', '招待所', '融通'
+)
+_REIMBURSABLE_RE = re.compile('|'.join(map(re.escape, _REIMBURSABLE_KEYWORDS)))
+
+# 退款交易关键词（均为中文，不受大小写影响，可直接匹配原始描述）
+_REFUND_KEYWORDS = (
+    '退款', '退货', '冲正', '撤销', '取消',
+    '返还', '退回', '退付', '退租', '退定'
+)
+_REFUND_RE = re.compile('|'.join(map(re.escape, _REFUND_KEYWORDS)))
+
+# 同一行文字的纵向坐标容差（与pdfplumber默认的y_tolerance一致）
+_LINE_Y_TOLERANCE = 3
+
+def _pymupdf_page_text(page) -> str:
+    """
+    使用PyMuPDF提取单页文本，并按纵向位置把单词重新拼成表格行
+    
+    PyMuPDF的纯文本模式会把表格的各列拆成独立的行，这里按单词坐标
+    重建与pdfplumber一致的行结构，以便后续正则匹配。
+    
+    Args:
+        page: PyMuPDF页面对象
+        
+    Returns:
+        以换行分隔的页面文本
+    """
+    words = sorted(page.get_text("words"), key=lambda w: (w[1], w[0]))
+    rows = []
+    last_top = None
+    for word in words:
+        top = word[1]
+        if last_top is None or top - last_top > _LINE_Y_TOLERANCE:
+            rows.append([])
+        rows[-1].append(word)
+        last_top = top
+    return '\n'.join(
+        ' '.join(w[4] for w in sorted(row, key=lambda w: w[0]))
+        for row in rows
+    )
+
+# pdfplumber回退路径中每个子进程至少处理的页数，页数较少时启动进程（导入依赖）的开销超过并行收益
+_MIN_PAGES_PER_WORKER = 25
+
+def _extract_page_range(pdf_path: str, start: int, stop: int) -> List[Optional[List[str]]]:
+    """
+    提取PDF中一段连续页面的有效文本行（可在子进程中运行）
+    
+    每段页面只打开一次PDF文件，避免逐页重复解析整个文档。
+    
+    Args:
+        pdf_path: PDF文件路径
+        start: 起始页码（从0开始，包含）
+        stop: 结束页码（不包含）
+        
+    Returns:
+        每页过滤后的文本行列表，页面没有文本时对应位置为None
+    """
+    results = []
+    with ExitStack() as stack:
+        doc = stack.enter_context(pymupdf.open(pdf_path)) if pymupdf is not None else None
+        pdf = None
+        for page_num in range(start, stop):
+            text = None
+            if doc is not None:
+                page = doc[page_num]
+                # 页面未引用任何字体说明没有文本层（如扫描图片、封面），无需再回退提取
+                if not page.get_fonts():
+                    results.append(None)
+                    continue
+                text = _pymupdf_page_text(page)
+            if not text:
+                # 未安装PyMuPDF或其未提取到文本时，回退到pdfplumber（按需打开一次）
+                if pdf is None:
+                    pdf = stack.enter_context(pdfplumber.open(pdf_path))
+                page = pdf.pages[page_num]
+                # 没有任何字符的页面直接跳过
+                if not page.chars:
+                    results.append(None)
+                    continue
+                # 只需要按行拼接的纯文本，使用extract_text_simple跳过单词级的布局分析
+                text = page.extract_text_simple()
+            if not text:
+                results.append(None)
+                continue
+            # 按行分割文本，一次遍历完成去除空白和过滤
+            # 空行和不包含数字的行（可能是表头或其他信息）都会被过滤掉
+            results.append([
+                stripped for line in text.split('\n')
+                if (stripped := line.strip()) and _HAS_DIGIT_RE.search(stripped)
+            ])
+    return results
+
 class CMBTransaction:
     """招商银行交易记录类"""
     
+    __slots__ = (
+        'date', 'description', 'amount', 'balance',
+        'transaction_type', 'card_number', 'foreign_amount'
+    )
+    
     def __init__(
         self,
         date: datetime,
@@ -64,6 +191,18 @@ class CMBBeanConverter:
         """
         self.config = self._load_config(config_path)
         self.logger = self._setup_logger()
+        self._category_rules = self._compile_rules(self.config)
+        # 常用配置项，避免在循环中反复查找字典
+        self._currency = self.config['currency']
+        self._income_account = self.config['accounts']['income']
+        self._expenses_account = self.config['accounts']['expenses']
+        self._assets_template = self.config['accounts']['assets_template']
+        # 小写描述（含交易地金额，与分类时匹配的文本一致） -> 分类规则匹配结果 的缓存（未命中规则时为None）
+        self._category_cache: Dict[str, Optional[str]] = {}
+        # 卡号 -> 主账户名 的缓存
+        self._account_cache: Dict[Optional[str], str] = {}
+        # 账单年份（用于只有月日的交易日期），在convert_pdf中根据文件名更新
+        self._bill_year = datetime.now().year
         
     def _load_config(self, config_path: str) -> Dict:
         """
@@ -81,6 +220,26 @@ class CMBBeanConverter:
         with open(config_path, 'r', encoding='utf-8') as f:
             return yaml.safe_load(f)
     
+    def _compile_rules(self, config: Dict) -> List[Tuple[str, str]]:
+        """
+        将分类规则展开为按模式长度降序排列的列表
+        
+        Args:
+            config: 配置字典
+            
+        Returns:
+            (小写模式, 账户名) 列表，较长的模式优先匹配
+        """
+        rules = [
+            (pattern.lower(), rule['account'])
+            for rule in config['rules']['categories'].values()
+            if isinstance(rule, dict)
+            for pattern in rule.get('patterns', [])
+        ]
+        # 稳定排序：长度相同时保持配置文件中的顺序
+        rules.sort(key=lambda item: -len(item[0]))
+        return rules
+    
     def _create_default_config(self, config_path: str) -> Dict:
         """
         创建默认配置文件
@@ -136,31 +295,43 @@ class CMBBeanConverter:
         """
         lines = []
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                self.logger.info(f"开始处理PDF文件，共 {len(pdf.pages)} 页")
+            if pymupdf is not None:
+                with pymupdf.open(pdf_path) as doc:
+                    page_count = doc.page_count
+            else:
+                with pdfplumber.open(pdf_path) as pdf:
+                    page_count = len(pdf.pages)
+            self.logger.info(f"开始处理PDF文件，共 {page_count} 页")
+            
+            # PyMuPDF提取很快，直接在当前进程中完成；回退到pdfplumber时，
+            # 只有页数足够多才把页面分成连续的几段在多个进程中并行提取，每段只打开一次文件
+            workers = 1
+            if pymupdf is None:
+                workers = max(1, min(os.cpu_count() or 1, page_count // _MIN_PAGES_PER_WORKER))
+            bounds = [page_count * i // workers for i in range(workers + 1)]
+            chunks = list(zip(bounds, bounds[1:]))
+            
+            extract_range = partial(_extract_page_range, pdf_path)
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    chunk_results = list(executor.map(extract_range, *zip(*chunks)))
+            else:
+                chunk_results = [extract_range(start, stop) for start, stop in chunks]
+            results = [page_lines for chunk in chunk_results for page_lines in chunk]
+            
+            for page_num, page_lines in enumerate(results, 1):
+                if page_lines is None:
+                    self.logger.warning(f"第 {page_num} 页未找到文本")
+                    continue
+                
+                # 调试输出
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug("第 %s 页原始文本行:", page_num)
+                    for line in page_lines:
+                        self.logger.debug("  %s", line)
                 
-                for page_num, page in enumerate(pdf.pages, 1):
-                    self.logger.info(f"正在处理第 {page_num} 页")
-                    
-                    # 提取页面文本
-                    text = page.extract_text()
-                    if text:
-                        # 按行分割文本
-                        page_lines = text.split('\n')
-                        # 过滤空行和无用行
-                        page_lines = [line.strip() for line in page_lines if line.strip()]
-                        # 过滤掉不包含数字的行（可能是表头或其他信息）
-                        page_lines = [line for line in page_lines if any(c.isdigit() for c in line)]
-                        
-                        # 调试输出
-                        self.logger.debug(f"第 {page_num} 页原始文本行:")
-                        for line in page_lines:
-                            self.logger.debug(f"  {line}")
-                        
-                        lines.extend(page_lines)
-                        self.logger.info(f"第 {page_num} 页成功提取 {len(page_lines)} 行文本")
-                    else:
-                        self.logger.warning(f"第 {page_num} 页未找到文本")
+                lines.extend(page_lines)
+                self.logger.info(f"第 {page_num} 页成功提取 {len(page_lines)} 行文本")
                 
             if not lines:
                 raise ValueError("未能从PDF中提取到任何文本数据")
@@ -171,125 +342,149 @@ class CMBBeanConverter:
             self.logger.error(f"处理PDF文件时发生错误: {str(e)}")
             raise
 
-    def _parse_transaction_line(self, line: str) -> Optional[CMBTransaction]:
+    def _parse_transaction_lines(self, lines: List[str]) -> List[CMBTransaction]:
         """
-        解析单行交易记录
+        批量解析交易记录
+        
+        空白规整、非交易行过滤和正则提取都以pandas向量化字符串操作一次性
+        完成，只有交易记录对象的构建逐行进行。
         
         Args:
-            line: 文本行
+            lines: 文本行列表
             
         Returns:
-            交易记录对象，如果不是交易记录则返回None
+            交易记录列表（保持原始行顺序）
         """
-        try:
-            # 移除多余的空白字符
-            line = re.sub(r'\s+', ' ', line.strip())
-            
+        # 移除多余的空白字符
+        series = pd.Series(lines, dtype=object).str.strip().str.replace(_WS_RE, ' ', regex=True)
+        
+        # 跳过一些特定的非交易行
+        skipped = series.str.contains(_SKIP_RE)
+        candidates = series[~skipped]
+        
+        # 首先尝试匹配还款交易，未匹配的行再尝试匹配普通交易
+        repayments = candidates.str.extract(_REPAY_RE).dropna(subset=[0])
+        remaining = candidates[~candidates.index.isin(repayments.index)]
+        normals = remaining.str.extract(_NORMAL_RE).dropna(subset=[0])
+        
+        repayment_groups = dict(zip(repayments.index, repayments.itertuples(index=False, name=None)))
+        normal_groups = dict(zip(normals.index, normals.itertuples(index=False, name=None)))
+        
+        transactions = []
+        for index, line in series.items():
             # 调试输出
-            self.logger.debug(f"尝试解析行: {line}")
-            
-            # 跳过一些特定的非交易行
-            skip_keywords = ['账单', '信用卡', '人民币', '美元', '合计', '小计', '币种', '卡号', '交易日', '本期', '上期', '备注']
-            if any(keyword in line for keyword in skip_keywords):
-                self.logger.debug(f"跳过非交易行: {line}")
-                return None
-            
-            # 尝试匹配还款交易格式（只有记账日）
-            # 格式：记账日 商户名称 金额 卡号末四位 交易地金额
-            repayment_pattern = r'(\d{2}/\d{2})\s+([^0-9]+?还款[^0-9]*?)\s+([-+]?[\d,.]+)\s+(\d{4})\s+(.*?)(?:\s*$|\s*\(.*\)$)'
-            
-            # 尝试匹配普通交易格式
-            # 格式：交易日 记账日 商户名称 金额 卡号末四位 交易地金额
-            normal_pattern = r'(\d{2}/\d{2})\s+(\d{2}/\d{2})\s+([^0-9]+?)\s+([-+]?[\d,.]+)\s+(\d{4})\s+(.*?)(?:\s*$|\s*\(.*\)$)'
-            
-            # 首先尝试匹配还款交易
-            match = re.search(repayment_pattern, line)
-            if match:
-                self.logger.debug(f"匹配到还款交易格式")
-                groups = match.groups()
-                self.logger.debug(f"匹配组: {groups}")
-                
-                # 解析日期（使用记账日）
-                trans_date = self._parse_date(groups[0])
-                description = groups[1].strip()
-                raw_amount = self._clean_amount(groups[2])
-                card_number = groups[3]
-                foreign_amount = groups[4].strip()
-                
-                # 创建还款交易记录
-                transaction = CMBTransaction(
-                    date=trans_date,
-                    description=description,
-                    amount=abs(raw_amount),
-                    transaction_type='还款',
-                    card_number=card_number,
-                    foreign_amount=foreign_amount
-                )
-                
-                # 保存当前交易记录用于分类
-                self._current_transaction = transaction
-                
-                self.logger.debug(f"成功解析还款交易: {trans_date.strftime('%Y-%m-%d')} {description} {abs(raw_amount)}")
-                return transaction
-            
-            # 如果不是还款交易，尝试匹配普通交易
-            match = re.search(normal_pattern, line)
-            if match:
-                self.logger.debug(f"匹配到普通交易格式")
-                groups = match.groups()
-                self.logger.debug(f"匹配组: {groups}")
-                
-                # 解析交易日期（使用交易日而不是记账日）
-                trans_date = self._parse_date(groups[0])
-                description = groups[2].strip()
-                raw_amount = self._clean_amount(groups[3])
-                card_number = groups[4]
-                foreign_amount = groups[5].strip()
-                
-                # 判断是否为退款交易
-                is_refund = (
-                    # 通过描述关键词判断
-                    any(keyword in description.lower() for keyword in [
-                        '退款', '退货', '冲正', '撤销', '取消', 
-                        '返还', '退回', '退付', '退租', '退定'
-                    ]) or
-                    # 通过交易地金额中的负号或括号判断
-                    (foreign_amount and (
-                        foreign_amount.startswith('-') or
-                        (foreign_amount.startswith('(') and foreign_amount.endswith(')'))
-                    ))
-                )
-                
-                # 确定交易类型和金额
-                if is_refund:
-                    transaction_type = '退款'
-                    amount = abs(raw_amount)
+            self.logger.debug("尝试解析行: %s", line)
+            
+            if skipped[index]:
+                self.logger.debug("跳过非交易行: %s", line)
+                continue
+            
+            try:
+                if index in repayment_groups:
+                    transaction = self._create_repayment(repayment_groups[index])
+                elif index in normal_groups:
+                    transaction = self._create_transaction(normal_groups[index])
                 else:
-                    transaction_type = '支出' if raw_amount > 0 else '收入'
-                    amount = abs(raw_amount)
-                
-                # 创建交易记录
-                transaction = CMBTransaction(
-                    date=trans_date,
-                    description=description,
-                    amount=amount,
-                    transaction_type=transaction_type,
-                    card_number=card_number,
-                    foreign_amount=foreign_amount
-                )
-                
-                # 保存当前交易记录用于分类
-                self._current_transaction = transaction
-                
-                self.logger.debug(f"成功解析交易: {trans_date.strftime('%Y-%m-%d')} {description} {amount} ({transaction_type})")
-                return transaction
+                    self.logger.debug("未能匹配交易格式: %s", line)
+                    continue
+            except Exception as e:
+                self.logger.debug("解析行失败: %s, 错误: %s", line, e)
+                continue
             
-            self.logger.debug(f"未能匹配交易格式: {line}")
-            return None
+            # 保存当前交易记录用于分类
+            self._current_transaction = transaction
+            transactions.append(transaction)
+        
+        return transactions
+
+    def _create_repayment(self, groups: Tuple[str, ...]) -> CMBTransaction:
+        """
+        根据还款交易格式的匹配组创建交易记录
+        
+        格式：记账日 商户名称 金额 卡号末四位 交易地金额
+        
+        Args:
+            groups: 正则匹配组
             
-        except Exception as e:
-            self.logger.debug(f"解析行失败: {line}, 错误: {str(e)}")
-            return None
+        Returns:
+            还款交易记录对象
+        """
+        self.logger.debug("匹配到还款交易格式")
+        self.logger.debug("匹配组: %s", groups)
+        
+        # 解析日期（使用记账日）
+        trans_date = self._parse_date(groups[0])
+        description = groups[1].strip()
+        raw_amount = self._clean_amount(groups[2])
+        card_number = groups[3]
+        foreign_amount = groups[4].strip()
+        
+        # 创建还款交易记录
+        transaction = CMBTransaction(
+            date=trans_date,
+            description=description,
+            amount=abs(raw_amount),
+            transaction_type='还款',
+            card_number=card_number,
+            foreign_amount=foreign_amount
+        )
+        
+        self.logger.debug("成功解析还款交易: %s %s %s", trans_date.date(), description, abs(raw_amount))
+        return transaction
+
+    def _create_transaction(self, groups: Tuple[str, ...]) -> CMBTransaction:
+        """
+        根据普通交易格式的匹配组创建交易记录
+        
+        格式：交易日 记账日 商户名称 金额 卡号末四位 交易地金额
+        
+        Args:
+            groups: 正则匹配组
+            
+        Returns:
+            交易记录对象
+        """
+        self.logger.debug("匹配到普通交易格式")
+        self.logger.debug("匹配组: %s", groups)
+        
+        # 解析交易日期（使用交易日而不是记账日）
+        trans_date = self._parse_date(groups[0])
+        description = groups[2].strip()
+        raw_amount = self._clean_amount(groups[3])
+        card_number = groups[4]
+        foreign_amount = groups[5].strip()
+        
+        # 判断是否为退款交易
+        is_refund = (
+            # 通过描述关键词判断
+            _REFUND_RE.search(description) or
+            # 通过交易地金额中的负号或括号判断
+            (foreign_amount and (
+                foreign_amount.startswith('-') or
+                (foreign_amount.startswith('(') and foreign_amount.endswith(')'))
+            ))
+        )
+        
+        # 确定交易类型和金额
+        if is_refund:
+            transaction_type = '退款'
+            amount = abs(raw_amount)
+        else:
+            transaction_type = '支出' if raw_amount > 0 else '收入'
+            amount = abs(raw_amount)
+        
+        # 创建交易记录
+        transaction = CMBTransaction(
+            date=trans_date,
+            description=description,
+            amount=amount,
+            transaction_type=transaction_type,
+            card_number=card_number,
+            foreign_amount=foreign_amount
+        )
+        
+        self.logger.debug("成功解析交易: %s %s %s (%s)", trans_date.date(), description, amount, transaction_type)
+        return transaction
 
     def _clean_amount(self, amount_str: str) -> float:
         """
@@ -303,11 +498,11 @@ class CMBBeanConverter:
         """
         try:
             # 处理空值
-            if pd.isna(amount_str) or amount_str.strip() == '':
+            if not amount_str or not amount_str.strip():
                 return 0.0
             
             # 移除货币符号、空白字符和千位分隔符
-            amount_str = re.sub(r'[¥\s,]', '', str(amount_str))
+            amount_str = _AMOUNT_CLEAN_RE.sub('', str(amount_str))
             
             # 处理特殊符号
             amount_str = amount_str.replace('CR', '-')  # 贷记卡收入标记
@@ -318,7 +513,7 @@ class CMBBeanConverter:
                 amount_str = '-' + amount_str[1:-1]
             
             # 调试输出
-            self.logger.debug(f"清理金额: {amount_str}")
+            self.logger.debug("清理金额: %s", amount_str)
             
             return float(amount_str)
             
@@ -336,15 +531,23 @@ class CMBBeanConverter:
         Returns:
             datetime对象
         """
+        # 信用卡账单日期格式（MM/DD）最为常见，格式已由正则确认，直接按位置取月日并使用账单年份
+        if date_str and _MMDD_RE.fullmatch(date_str):
+            return datetime(self._bill_year, int(date_str[:2]), int(date_str[3:5]))
+        
         # 处理空值
-        if pd.isna(date_str) or date_str.strip() == '':
+        if not date_str or not date_str.strip():
             raise ValueError("日期不能为空")
             
         # 清理日期字符串
-        date_str = re.sub(r'\s+', '', str(date_str))
+        date_str = _WS_RE.sub('', str(date_str))
         
         # 调试输出
-        self.logger.debug(f"解析日期: {date_str}")
+        self.logger.debug("解析日期: %s", date_str)
+        
+        # 清理后为MM/DD格式，使用账单年份
+        if _MMDD_RE.match(date_str):
+            return datetime(self._bill_year, int(date_str[:2]), int(date_str[3:5]))
         
         # 尝试多种常见的日期格式
         date_formats = [
@@ -361,18 +564,6 @@ class CMBBeanConverter:
         # 当前年份（用于处理只有月日的情况）
         current_year = datetime.now().year
         
-        # 如果是信用卡账单日期格式（MM/DD），使用账单年份
-        if re.match(r'\d{2}/\d{2}$', date_str):
-            try:
-                # 从账单文件名中提取年份
-                bill_year = int(os.path.basename(self.current_file).split('年')[0])
-                date = datetime.strptime(date_str, '%m/%d')
-                return date.replace(year=bill_year)
-            except (ValueError, IndexError, AttributeError):
-                # 如果无法从文件名获取年份，使用当前年份
-                date = datetime.strptime(date_str, '%m/%d')
-                return date.replace(year=current_year)
-        
         # 尝试其他日期格式
         for fmt in date_formats:
             try:
@@ -396,28 +587,27 @@ class CMBBeanConverter:
             output_file: 输出Beancount文件路径
         """
         try:
-            # 保存当前文件路径（用于从文件名获取年份）
-            self.current_file = input_file
+            # 从账单文件名中提取年份，如果无法获取或超出有效范围，使用当前年份
+            try:
+                bill_year = int(os.path.basename(input_file).split('年')[0])
+            except ValueError:
+                bill_year = None
+            if bill_year is None or not MINYEAR <= bill_year <= MAXYEAR:
+                bill_year = datetime.now().year
+            self._bill_year = bill_year
             
             # 提取PDF中的文本行
             lines = self._extract_text_from_pdf(input_file)
             
             # 解析交易记录
-            transactions = []
-            for line in lines:
-                transaction = self._parse_transaction_line(line)
-                if transaction:
-                    transactions.append(transaction)
+            transactions = self._parse_transaction_lines(lines)
             
             if not transactions:
                 raise ValueError("未能解析出任何有效的交易记录")
             
-            # 生成Beancount文本
-            beancount_text = self._generate_beancount(transactions)
-            
-            # 写入输出文件
+            # 逐条生成Beancount文本并写入输出文件
             with open(output_file, 'w', encoding='utf-8') as f:
-                f.write(beancount_text)
+                f.writelines(self._iter_beancount(transactions))
                 
             self.logger.info(f"成功将账单转换为Beancount格式并保存到 {output_file}")
             self.logger.info(f"共处理 {len(transactions)} 条交易记录")
@@ -426,38 +616,31 @@ class CMBBeanConverter:
             self.logger.error(f"转换过程中发生错误: {str(e)}")
             raise
 
-    def _generate_beancount(self, transactions: List[CMBTransaction]) -> str:
+    def _iter_beancount(self, transactions: List[CMBTransaction]) -> Iterator[str]:
         """
-        生成Beancount格式文本
+        逐段生成Beancount格式文本
         
         Args:
             transactions: 交易记录列表
             
-        Returns:
-            Beancount格式的文本
+        Yields:
+            以换行结尾的文件头和每条交易记录的文本
         """
-        beancount_lines = []
-        
         # 添加文件头注释
-        beancount_lines.extend([
+        yield "\n".join([
             "; 由cmb2beancount工具自动生成",
             "; 生成时间: " + datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
             "; 注意：中铁网络等交通支出以及酒店、机票等旅游支出如需报销，请手动添加 #报销 标签并修改支出账户为 Assets:Receivable:Reimbursement:可报销",
-            ""
-        ])
-        
-        # 收集所有用到的账户
-        accounts = set()
-        for trans in transactions:
-            accounts.add(self._get_account(trans))
-        
+        ]) + "\n"
         
         # 按日期排序交易记录
-        transactions.sort(key=lambda x: x.date)
+        transactions.sort(key=operator.attrgetter('date'))
         
         for trans in transactions:
             date_str = trans.date.strftime("%Y-%m-%d")
-            amount_str = f"{trans.amount:.2f} {self.config['currency']}"
+            amount_str = f"{trans.amount:.2f} {self._currency}"
+            # 交易的主账户，各分支共用
+            account = self._get_account(trans)
             
             # 构建交易描述（不再在描述中显示卡号，因为已经在账户名中体现）
             description = trans.description
@@ -466,8 +649,9 @@ class CMBBeanConverter:
             if trans.foreign_amount:
                 description += f" ({trans.foreign_amount})"
 
-            # 获取交易分类
-            category_account = self._get_category_account(description)
+            # 获取交易分类（只转换一次小写，供分类和报销判断共用）
+            description_lower = description.lower()
+            category_account = self._get_category_account(description_lower)
             
             # 构建Beancount交易记录
             if trans.transaction_type == '还款':
@@ -475,7 +659,7 @@ class CMBBeanConverter:
                 lines = [
                     f"{date_str} * \"{description}\" #repayment",  # 添加 #还款 标签
                     f"  ; 类型: 信用卡还款",  # 添加注释说明
-                    f"  {self._get_account(trans)} {amount_str}",
+                    f"  {account} {amount_str}",
                     f"  Assets:CCB4914:建设银行4914"
                 ]
             elif trans.transaction_type == '退款':
@@ -483,79 +667,67 @@ class CMBBeanConverter:
                 lines = [
                     f"{date_str} * \"{description}\" #refund",  # 添加 #退款 标签
                     f"  ; 类型: 退款交易",  # 添加注释说明
-                    f"  {self._get_account(trans)} {amount_str}",
+                    f"  {account} {amount_str}",
                     f"  {category_account} -{amount_str}"
                 ]
             else:
                 # 检查是否为可能需要报销的交易
-                is_reimbursable = any(keyword in description.lower() for keyword in [
-                    '中铁网络', '铁路客票', '火车票', '动车', '高铁', '12306',
-                    '差旅', '商务', '出差', '机票', '酒店', '住宿', '招待所', '融通'
-                ])
+                is_reimbursable = _REIMBURSABLE_RE.search(description_lower)
                 
                 if is_reimbursable:
                     # 可报销交易：添加提示注释
                     lines = [
                         f"{date_str} * \"{description}\"",
                         f"  ; 提示: 如需报销请添加 #报销 标签并修改支出账户为 Assets:Receivable:Reimbursement:可报销",
-                        f"  {self._get_account(trans)} -{amount_str}",
+                        f"  {account} -{amount_str}",
                         f"  {category_account}"
                     ]
                 else:
                     # 普通收支交易
                     lines = [
                         f"{date_str} * \"{description}\"",
-                        f"  {self._get_account(trans)} {'-' if trans.transaction_type == '支出' else ''}{amount_str}",
+                        f"  {account} {'-' if trans.transaction_type == '支出' else ''}{amount_str}",
                         f"  {category_account}"
                     ]
             
-            beancount_lines.extend(lines)
-            beancount_lines.append("")
-        
-        return "\n".join(beancount_lines)
+            # 每条交易记录前空一行
+            yield "\n" + "\n".join(lines) + "\n"
 
     def _get_category_account(self, description: str) -> str:
         """
         根据交易描述获取对应的账户分类
         
         Args:
-            description: 交易描述
+            description: 小写的交易描述，含交易地金额（不区分大小写匹配）
             
         Returns:
             Beancount账户名
         """
-        # 转换为小写以进行不区分大小写的匹配
-        description = description.lower()
-        
-        # 记录最佳匹配的分类和其优先级
-        best_match = None
-        best_priority = -1
-        
-        for category, rule in self.config['rules']['categories'].items():
-            if isinstance(rule, dict):
-                patterns = rule.get('patterns', [])
-                for pattern in patterns:
-                    pattern = pattern.lower()
-                    if pattern in description:
-                        # 计算匹配优先级（使用模式长度作为优先级）
-                        priority = len(pattern)
-                        if priority > best_priority:
-                            best_match = rule['account']
-                            best_priority = priority
-                            self.logger.debug(f"找到更好的分类匹配: {pattern} -> {rule['account']}")
+        # 描述完全相同的交易（同一商户且交易地金额相同）只扫描一次规则
+        if description in self._category_cache:
+            best_match = self._category_cache[description]
+        else:
+            # 规则已按模式长度降序排列，第一个命中的即为最长匹配
+            best_match = None
+            for pattern, account in self._category_rules:
+                if pattern in description:
+                    best_match = account
+                    self.logger.debug("找到分类匹配: %s -> %s", pattern, account)
+                    break
+            self._category_cache[description] = best_match
         
         if best_match:
-            self.logger.debug(f"商家 '{description}' 被分类为 {best_match}")
+            self.logger.debug("商家 '%s' 被分类为 %s", description, best_match)
             return best_match
             
         # 如果是收入类交易，使用收入账户
         if hasattr(self, '_current_transaction') and self._current_transaction.transaction_type == '收入':
-            self.logger.debug(f"使用默认收入账户: {self.config['accounts']['income']}")
-            return self.config['accounts']['income']
+            self.logger.debug("使用默认收入账户: %s", self._income_account)
+            return self._income_account
         
         # 使用默认支出账户
-        self.logger.debug(f"使用默认支出账户: {self.config['accounts']['expenses']}")
-        return self.config['accounts']['expenses']
+        self.logger.debug("使用默认支出账户: %s", self._expenses_account)
+        return self._expenses_account
     
     def _get_account(self, transaction: CMBTransaction) -> str:
         """
@@ -567,16 +739,15 @@ class CMBBeanConverter:
         Returns:
             Beancount账户名
         """
-        if transaction.card_number:
-            # 使用卡号后四位生成账户名
-            return self.config['accounts']['assets_template'].format(
-                card_number=transaction.card_number
-            )
-        else:
-            # 如果没有卡号信息，使用默认账户
-            return self.config['accounts']['assets_template'].format(
-                card_number='Unknown'
+        card_number = transaction.card_number
+        account = self._account_cache.get(card_number)
+        if account is None:
+            # 使用卡号后四位生成账户名，如果没有卡号信息，使用默认账户
+            account = self._assets_template.format(
+                card_number=card_number or 'Unknown'
             )
+            self._account_cache[card_number] = account
+        return account
 
 def main():
     """主函数"""